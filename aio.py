@@ -0,0 +1,332 @@
+#!/usr/bin/env python3
+
+import asyncio, collections
+
+import recv, send
+
+class AsyncioLoop:
+    """
+    Gives the Sender and Receiver the EventLoop interface on top of a running asyncio loop, so the
+    same protocol code runs under both. As with EventLoop, work is batched into passes: whatever
+    happens schedules a single run of the end-of-pass hooks on the asyncio loop.
+    Attributes
+    ----------
+    loop : AbstractEventLoop
+        The asyncio loop we run on.
+    handles : dict
+        The asyncio handle of each pending timer, by key.
+    hooks : list
+        The callbacks run at the end of every pass.
+    pass_scheduled : Boolean
+        Whether the end of the current pass has been scheduled already.
+    stopped : Future
+        Done once stop() has been called.
+    """
+    def __init__(self, loop):
+        self.loop = loop
+        self.handles = {}
+        self.hooks = []
+        self.pass_scheduled = False
+        self.stopped = loop.create_future()
+
+    def time(self):
+        return self.loop.time()
+
+    def run(self, callback, *args):
+        """ Runs the given callback as part of the current pass. """
+        callback(*args)
+        self.end_pass_soon()
+
+    def call_soon(self, callback):
+        """ Runs the given callback on the next turn of the asyncio loop. """
+        self.loop.call_soon(self.run, callback)
+
+    def call_at(self, key, deadline, callback):
+        """ Calls the given callback at the given time, replacing any other timer with this key. """
+        self.cancel(key)
+        self.handles[key] = self.loop.call_at(deadline, self.fire, key, callback)
+
+    def fire(self, key, callback):
+        del self.handles[key]
+        self.run(callback)
+
+    def cancel(self, key):
+        """ Stops the timer with the given key, if there is one. """
+        handle = self.handles.pop(key, None)
+        if handle is not None:
+            handle.cancel()
+
+    def at_end_of_pass(self, callback):
+        """ Calls the given callback at the end of every pass. """
+        self.hooks.append(callback)
+
+    def end_pass_soon(self):
+        """ Makes sure the end-of-pass hooks run once everything already due has. """
+        if not self.pass_scheduled:
+            self.pass_scheduled = True
+            self.loop.call_soon(self.end_pass)
+
+    def end_pass(self):
+        self.pass_scheduled = False
+        for hook in self.hooks:
+            hook()
+
+    def stop(self):
+        """ Marks the connection as done. Pending timers are left to the caller to cancel. """
+        if not self.stopped.done():
+            self.stopped.set_result(None)
+
+class TransportSocket:
+    """
+    Stands in for a DatagramSocket. Packets are queued and flushed the same way, but go out
+    through an asyncio datagram transport, which also does the receiving.
+    Attributes
+    ----------
+    transport : DatagramTransport
+        The transport to send through, or None before it is connected.
+    outgoing : list
+        The (packet, address) pairs waiting to be sent.
+    """
+    def __init__(self):
+        self.transport = None
+        self.outgoing = []
+
+    def sendto(self, packet, address):
+        """ Queues the given packet to be sent on the next flush. """
+        self.outgoing.append((packet, address))
+
+    def sendmsg(self, buffers, address):
+        """
+        Queues a packet made up of the given buffers. Transports cannot gather buffers, so they
+        are joined here.
+        """
+        self.outgoing.append((b"".join(buffers), address))
+
+    def flush(self):
+        """ Sends every queued packet, unless the transport is gone. """
+        if self.transport is not None and not self.transport.is_closing():
+            for packet, address in self.outgoing:
+                self.transport.sendto(packet, address)
+        self.outgoing.clear()
+
+class ChunkQueue:
+    """
+    Stands in for the Receiver's OutputBuffer. Printed data waits here until the application
+    reads it, and counts against the advertised window until then.
+    Attributes
+    ----------
+    chunks : deque
+        The printed data the application has yet to read, one message per chunk.
+    ready : Event
+        Set when there may be chunks to read.
+    """
+    def __init__(self):
+        self.chunks = collections.deque()
+        self.ready = asyncio.Event()
+
+    def __len__(self):
+        return len(self.chunks)
+
+    def write(self, data):
+        self.chunks.append(data)
+        self.ready.set()
+
+    def flush(self):
+        return 0
+
+class AsyncSender(send.Sender, asyncio.DatagramProtocol):
+    """
+    A Sender that runs as an asyncio datagram protocol and sends whatever is written to it
+    instead of standard input. Get one from connect(). write() waits while high_water bytes or
+    more are buffered, and while the transport has asked us to pause writing.
+    Attributes
+    ----------
+    transport : DatagramTransport
+        The transport we send and receive through.
+    buffer : bytearray
+        The data written to us that has yet to go out in a message.
+    high_water : int
+        How many bytes may be buffered before write() waits.
+    closing : Boolean
+        Whether close() has been called, so that no more data is coming.
+    paused : Boolean
+        Whether the transport has asked us to pause writing.
+    writable : Event
+        Set while write() may return.
+    input_wanted : Boolean
+        Whether the window and the pacer have room for new data.
+    input_scheduled : Boolean
+        Whether a call to read_input() is already scheduled.
+    """
+    def __init__(self, host, port, high_water=65536, **options):
+        super().__init__(host, port, loop=AsyncioLoop(asyncio.get_running_loop()),
+                         sock=TransportSocket(), **options)
+        self.transport = None
+        self.buffer = bytearray()
+        self.high_water = high_water
+        self.closing = False
+        self.paused = False
+        self.writable = asyncio.Event()
+        self.writable.set()
+        self.input_wanted = False
+        self.input_scheduled = False
+        self.loop.at_end_of_pass(self.schedule)
+
+    def connection_made(self, transport):
+        self.transport = transport
+        self.socket.transport = transport
+        self.loop.end_pass_soon()
+
+    def datagram_received(self, data, addr):
+        self.receive_ack(data)
+        self.fast_retransmit()
+        self.retransmit_msgs()
+        self.loop.end_pass_soon()
+
+    def error_received(self, exc):
+        self.log("Socket error: %s" % exc)
+
+    def connection_lost(self, exc):
+        for key in self.timer_keys:
+            self.loop.cancel(key)
+        if not self.loop.stopped.done():
+            self.loop.stopped.set_exception(exc or ConnectionError("connection lost"))
+        self.writable.set()
+
+    def pause_writing(self):
+        self.paused = True
+        self.update_writable()
+
+    def resume_writing(self):
+        self.paused = False
+        self.update_writable()
+
+    def update_writable(self):
+        """ Lets write() return or makes it wait, depending on the buffer and the transport. """
+        if self.loop.stopped.done() or not self.paused and len(self.buffer) < self.high_water:
+            self.writable.set()
+        else:
+            self.writable.clear()
+
+    def next_chunk(self):
+        if not self.buffer:
+            return b"" if self.closing else None
+        data = bytes(self.buffer[:self.codec.data_size])
+        del self.buffer[:self.codec.data_size]
+        self.update_writable()
+        return data
+
+    def want_input(self, wanted):
+        self.input_wanted = wanted
+        if wanted and (self.buffer or self.closing) and not self.input_scheduled:
+            self.input_scheduled = True
+            self.loop.call_soon(self.feed)
+
+    def feed(self):
+        """ Sends the next message's worth of what was written to us, if there is still room. """
+        self.input_scheduled = False
+        if self.input_wanted:
+            self.read_input()
+
+    async def write(self, data):
+        """ Queues the given bytes to be sent, first waiting while too much is buffered already. """
+        if self.closing:
+            raise ConnectionError("connection is closing")
+        self.buffer += data
+        self.update_writable()
+        self.loop.end_pass_soon()
+        await self.writable.wait()
+        if self.loop.stopped.done():
+            # Raises if the connection was lost
+            self.loop.stopped.result()
+
+    async def close(self):
+        """ Waits until everything written has been acknowledged, then closes the transport. """
+        self.closing = True
+        self.loop.end_pass_soon()
+        try:
+            await self.loop.stopped
+        finally:
+            self.transport.close()
+
+class AsyncReceiver(recv.Receiver, asyncio.DatagramProtocol):
+    """
+    A Receiver that runs as an asyncio datagram protocol and hands the data it receives to
+    `async for` instead of writing it to standard output. Get one from listen(). Data the
+    application has not read yet counts against the advertised window, so a slow reader slows
+    the Sender down. `async for` ends with the stream, once the Sender's FIN has arrived, and the
+    transport is closed when the linger is over.
+    Attributes
+    ----------
+    transport : DatagramTransport
+        The transport we send and receive through.
+    closed : Boolean
+        Whether the transport has been closed.
+    """
+    def __init__(self, window=1024):
+        super().__init__(window, loop=AsyncioLoop(asyncio.get_running_loop()),
+                         sock=TransportSocket(), sink=ChunkQueue())
+        self.transport = None
+        self.closed = False
+        self.loop.at_end_of_pass(self.end_pass)
+
+    def connection_made(self, transport):
+        self.transport = transport
+        self.socket.transport = transport
+        self.port = transport.get_extra_info("sockname")[1]
+        self.log("Bound to port %d" % self.port)
+        self.loop.stopped.add_done_callback(lambda stopped: transport.close())
+
+    def datagram_received(self, data, addr):
+        self.receive_msg(data, addr)
+        if self.ended():
+            self.output.ready.set()
+        self.loop.end_pass_soon()
+
+    def error_received(self, exc):
+        self.log("Socket error: %s" % exc)
+
+    def connection_lost(self, exc):
+        for key in ("ack", "linger"):
+            self.loop.cancel(key)
+        self.closed = True
+        self.output.ready.set()
+
+    def watch_output(self):
+        # The application pulls the data, so there is nothing to wait for
+        pass
+
+    def __aiter__(self):
+        return self
+
+    async def __anext__(self):
+        while not self.output.chunks:
+            if self.closed or self.ended():
+                raise StopAsyncIteration
+            self.output.ready.clear()
+            await self.output.ready.wait()
+        chunk = self.output.chunks.popleft()
+        # Reading frees up room, which may reopen a window we advertised as closed
+        self.loop.end_pass_soon()
+        return chunk
+
+    def close(self):
+        """ Closes the transport, which ends `async for` once the data already read is used up. """
+        self.transport.close()
+
+async def connect(host, port, **options):
+    """
+    Opens a connection to the Receiver at the given address and returns its AsyncSender. The
+    options are those of Sender, plus high_water.
+    """
+    loop = asyncio.get_running_loop()
+    transport, conn = await loop.create_datagram_endpoint(
+        lambda: AsyncSender(host, port, **options), local_addr=('0.0.0.0', 0))
+    return conn
+
+async def listen(port=0, window=1024):
+    """ Starts receiving on the given UDP port (any free one by default) and returns the AsyncReceiver. """
+    loop = asyncio.get_running_loop()
+    transport, conn = await loop.create_datagram_endpoint(
+        lambda: AsyncReceiver(window), local_addr=('0.0.0.0', port))
+    return conn
@@ -0,0 +1,228 @@
+#!/usr/bin/env python3
+
+import collections
+
+class CongestionController:
+    """
+    The interface every congestion controller follows. The Sender tells its controller about
+    acknowledged messages, losses and RTT samples, and never keeps more messages in flight than the
+    controller's window. All windows are counted in messages.
+    Attributes
+    ----------
+    name : str
+        The name this controller is selected by on the command line.
+    cwnd : double
+        The congestion window.
+    pacing_gain : double
+        How much faster than one window per smoothed RTT we pace, so pacing never holds the
+        window back on its own.
+    """
+    name = None
+    pacing_gain = 1.25
+
+    def __init__(self, initial_window=4):
+        self.cwnd = initial_window
+
+    def window(self):
+        """ Returns how many messages may be in flight, which is always at least one. """
+        return max(1, int(self.cwnd))
+
+    def pacing_rate(self, srtt):
+        """ Returns how many messages per second to pace at, given the smoothed RTT. """
+        return self.pacing_gain * self.cwnd / srtt
+
+    def on_ack(self, acked, now):
+        """ Called when an ACK releases the given number of messages we were waiting on. """
+
+    def on_loss(self, msg_id, highest_sent, now, timeout=False):
+        """
+        Called when the given message is presumed lost, either through a fast retransmit or,
+        if timeout is set, through its retransmission timer running out. highest_sent is the
+        highest message ID sent so far.
+        """
+
+    def on_rtt_sample(self, rtt, now):
+        """ Called with every RTT sample the Sender takes. """
+
+    def state(self):
+        """ Returns the controller's state, for instrumentation. """
+        return { "cwnd": self.cwnd }
+
+class NewReno(CongestionController):
+    """
+    Slow start and congestion avoidance as in RFC 5681, with the NewReno rule of cutting the window
+    at most once per window of data (RFC 6582).
+    Attributes
+    ----------
+    ssthresh : double
+        The slow start threshold.
+    recovery_point : int
+        The highest message ID sent when we last cut the window. Losses at or below it belong to
+        the same congestion event.
+    """
+    name = "newreno"
+
+    def __init__(self, initial_window=4):
+        super().__init__(initial_window)
+        self.ssthresh = float("inf")
+        self.recovery_point = 0
+
+    def on_ack(self, acked, now):
+        if self.cwnd < self.ssthresh:
+            self.cwnd += acked
+        else:
+            self.cwnd += acked / self.cwnd
+
+    def on_loss(self, msg_id, highest_sent, now, timeout=False):
+        if msg_id <= self.recovery_point and not timeout:
+            return
+        self.recovery_point = highest_sent
+        self.ssthresh = max(self.cwnd / 2, 2)
+        self.cwnd = 1 if timeout else self.ssthresh
+
+    def state(self):
+        return { "cwnd": self.cwnd, "ssthresh": self.ssthresh }
+
+class Cubic(NewReno):
+    """
+    CUBIC as in RFC 8312. After a loss the window grows along a cubic curve that flattens out
+    around the window the loss happened at, and it never grows slower than Reno would.
+    Attributes
+    ----------
+    w_max : double
+        The window at the last loss.
+    epoch_start : double
+        When the current congestion avoidance epoch began, or None before it has.
+    srtt : double
+        A smoothed RTT, used to look one RTT ahead on the curve.
+    c : double
+        The scaling constant of the cubic curve.
+    beta : double
+        How much of the window is kept after a loss.
+    """
+    name = "cubic"
+    c = 0.4
+    beta = 0.7
+
+    def __init__(self, initial_window=4):
+        super().__init__(initial_window)
+        self.w_max = 0
+        self.epoch_start = None
+        self.srtt = None
+
+    def on_rtt_sample(self, rtt, now):
+        self.srtt = rtt if self.srtt is None else 0.875 * self.srtt + 0.125 * rtt
+
+    def on_ack(self, acked, now):
+        if self.cwnd < self.ssthresh or self.srtt is None:
+            self.cwnd += acked
+            return
+
+        if self.epoch_start is None:
+            self.epoch_start = now
+            self.w_max = max(self.w_max, self.cwnd)
+        k = (self.w_max * (1 - self.beta) / self.c) ** (1 / 3)
+        t = now - self.epoch_start
+        target = self.c * (t + self.srtt - k) ** 3 + self.w_max
+        # The window standard TCP would have reached by now (the "TCP-friendly region")
+        reno = self.w_max * self.beta + 3 * (1 - self.beta) / (1 + self.beta) * t / self.srtt
+        target = max(target, reno)
+        if target > self.cwnd:
+            self.cwnd += acked * (target - self.cwnd) / self.cwnd
+        else:
+            self.cwnd += acked / (100 * self.cwnd)
+
+    def on_loss(self, msg_id, highest_sent, now, timeout=False):
+        if msg_id <= self.recovery_point and not timeout:
+            return
+        self.recovery_point = highest_sent
+        self.epoch_start = None
+        self.w_max = self.cwnd
+        self.ssthresh = max(self.cwnd * self.beta, 2)
+        self.cwnd = 1 if timeout else self.ssthresh
+
+    def state(self):
+        return { "cwnd": self.cwnd, "ssthresh": self.ssthresh, "w_max": self.w_max }
+
+class BbrLite(CongestionController):
+    """
+    A simple model-based controller after BBR. It estimates the bottleneck bandwidth as the highest
+    delivery rate over the last few rounds and the path delay as the lowest RTT seen, and keeps
+    cwnd_gain times their product in flight. Until the bandwidth estimate stops growing it doubles
+    every round like slow start. Losses are not taken as a congestion signal, except that a time
+    out starts over from a window of one.
+    Attributes
+    ----------
+    min_rtt : double
+        The lowest RTT seen, or None before the first sample.
+    delivered : int
+        How many messages have been acknowledged in total.
+    round_start : double
+        When the current delivery rate sample began, or None before the first ACK.
+    round_delivered : int
+        The value of delivered when the current sample began.
+    bw_samples : deque
+        The delivery rates, in messages per second, of the last few rounds.
+    full_bw : double
+        The bandwidth estimate the startup phase is trying to grow past.
+    full_bw_rounds : int
+        How many rounds in a row the estimate has failed to grow by a quarter.
+    filled : Boolean
+        Whether the startup phase is over and the window follows the model.
+    cwnd_gain : double
+        How many times the estimated bandwidth-delay product we keep in flight.
+    """
+    name = "bbr"
+    cwnd_gain = 2
+    bw_rounds = 10
+
+    def __init__(self, initial_window=4):
+        super().__init__(initial_window)
+        self.min_rtt = None
+        self.delivered = 0
+        self.round_start = None
+        self.round_delivered = 0
+        self.bw_samples = collections.deque(maxlen=self.bw_rounds)
+        self.full_bw = 0
+        self.full_bw_rounds = 0
+        self.filled = False
+
+    def on_rtt_sample(self, rtt, now):
+        self.min_rtt = rtt if self.min_rtt is None else min(self.min_rtt, rtt)
+
+    def on_ack(self, acked, now):
+        self.delivered += acked
+        if self.round_start is None:
+            self.round_start = now
+        if self.min_rtt is not None and now - self.round_start >= self.min_rtt:
+            self.bw_samples.append((self.delivered - self.round_delivered) / (now - self.round_start))
+            self.round_start = now
+            self.round_delivered = self.delivered
+            self.check_full_bw()
+
+        if self.filled:
+            self.cwnd = max(4, self.cwnd_gain * max(self.bw_samples) * self.min_rtt)
+        else:
+            self.cwnd += acked
+
+    def check_full_bw(self):
+        """ Ends the startup phase once the bandwidth estimate stops growing for three rounds. """
+        bw = max(self.bw_samples)
+        if bw >= 1.25 * self.full_bw:
+            self.full_bw = bw
+            self.full_bw_rounds = 0
+        else:
+            self.full_bw_rounds += 1
+            self.filled = self.filled or self.full_bw_rounds >= 3
+
+    def on_loss(self, msg_id, highest_sent, now, timeout=False):
+        if timeout:
+            self.cwnd = 1
+
+    def state(self):
+        return { "cwnd": self.cwnd, "min_rtt": self.min_rtt,
+                 "bw": max(self.bw_samples) if self.bw_samples else None, "filled": self.filled }
+
+CONTROLLERS = { controller.name: controller for controller in (NewReno, Cubic, BbrLite) }
+
+DEFAULT = "bbr"
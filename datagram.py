@@ -0,0 +1,68 @@
+#!/usr/bin/env python3
+
+import socket
+
+class DatagramSocket:
+    """
+    A non-blocking UDP socket that works in batches. Each wakeup reads every datagram waiting for
+    it, up to a budget, through one preallocated buffer, and the packets sent during a loop
+    iteration are queued and go out together at its end.
+    Attributes
+    ----------
+    socket : socket
+        The underlying UDP socket.
+    budget : int
+        The most datagrams a single drain reads, so a flood cannot starve the rest of the loop.
+    buffer : bytearray
+        The buffer every datagram is received into.
+    outgoing : list
+        The (buffers, address) pairs waiting to be sent, where the buffers make up one packet.
+    """
+    def __init__(self, budget=64):
+        self.socket = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+        self.socket.bind(('0.0.0.0', 0))
+        self.socket.setblocking(False)
+        self.budget = budget
+        self.buffer = bytearray(65535)
+        self.outgoing = []
+
+    def fileno(self):
+        return self.socket.fileno()
+
+    def getsockname(self):
+        return self.socket.getsockname()
+
+    def drain(self):
+        """ Reads the datagrams waiting for us, up to the budget, as a list of (packet, address). """
+        packets = []
+        view = memoryview(self.buffer)
+        while len(packets) < self.budget:
+            try:
+                size, address = self.socket.recvfrom_into(self.buffer)
+            except BlockingIOError:
+                break
+            # The buffer is reused for the next datagram, so each packet gets its own copy
+            packets.append((bytes(view[:size]), address))
+        return packets
+
+    def sendto(self, packet, address):
+        """ Queues the given packet to be sent on the next flush. """
+        self.outgoing.append(([packet], address))
+
+    def sendmsg(self, buffers, address):
+        """
+        Queues a packet made up of the given buffers to be sent on the next flush. They are
+        gathered by the kernel, so they are never copied together.
+        """
+        self.outgoing.append((buffers, address))
+
+    def flush(self):
+        """ Sends every queued packet. """
+        for buffers, address in self.outgoing:
+            try:
+                self.socket.sendmsg(buffers, (), 0, address)
+            except BlockingIOError:
+                # The socket's send buffer is full, which to the other side looks like any other
+                # lost packet
+                pass
+        self.outgoing.clear()
@@ -0,0 +1,82 @@
+#!/usr/bin/env python3
+
+class RttEstimator:
+    """
+    Estimates the round trip time and the retransmission time out as laid out in RFC 6298.
+    Attributes
+    ----------
+    srtt : double
+        The smoothed round trip time, or None before the first sample.
+    rttvar : double
+        The round trip time variation, or None before the first sample.
+    rto : double
+        The current retransmission time out, including any backoff.
+    min_rto : double
+        The smallest time out we will ever use.
+    max_rto : double
+        The largest time out we will ever use, even when backing off.
+    granularity : double
+        The clock granularity, which is the least variation we allow for.
+    samples : int
+        How many RTT samples we have taken.
+    backoffs : int
+        How many times the time out has been doubled since the last sample.
+    alpha : double
+        The gain of a new sample on the smoothed round trip time.
+    beta : double
+        The gain of a new sample on the round trip time variation.
+    k : int
+        How many times the variation is added to the smoothed round trip time.
+    """
+    alpha = 1 / 8
+    beta = 1 / 4
+    k = 4
+
+    def __init__(self, initial_rto=3.0, min_rto=0.2, max_rto=60.0, granularity=0.01):
+        self.srtt = None
+        self.rttvar = None
+        self.rto = initial_rto
+        self.min_rto = min_rto
+        self.max_rto = max_rto
+        self.granularity = granularity
+        self.samples = 0
+        self.backoffs = 0
+
+    def clamp(self, rto):
+        """ Keeps the given time out between the minimum and the maximum. """
+        return min(max(rto, self.min_rto), self.max_rto)
+
+    def sample(self, rtt):
+        """
+        Folds in a round trip time measured on a message that was only sent once. Callers must
+        skip messages that were retransmitted (Karn's algorithm), since their ACK could be for any
+        of the copies.
+        """
+        if self.srtt is None:
+            self.srtt = rtt
+            self.rttvar = rtt / 2
+        else:
+            self.rttvar = (1 - self.beta) * self.rttvar + self.beta * abs(self.srtt - rtt)
+            self.srtt = (1 - self.alpha) * self.srtt + self.alpha * rtt
+        self.samples += 1
+        self.clear_backoff()
+
+    def clear_backoff(self):
+        """
+        Rebuilds the time out from the smoothed round trip time and its variation, dropping any
+        backoff. Besides after a sample, this is done when an ACK for new data shows the path is
+        working again, even if Karn's algorithm kept us from sampling it.
+        """
+        if self.srtt is not None:
+            self.rto = self.clamp(self.srtt + max(self.granularity, self.k * self.rttvar))
+        self.backoffs = 0
+
+    def back_off(self):
+        """ Doubles the time out after a retransmission timer runs out. """
+        self.rto = self.clamp(2 * self.rto)
+        self.backoffs += 1
+
+    def state(self):
+        """ Returns the estimator's state, for instrumentation. """
+        return { "srtt": self.srtt, "rttvar": self.rttvar, "rto": self.rto,
+                 "samples": self.samples, "backoffs": self.backoffs }
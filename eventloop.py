@@ -0,0 +1,131 @@
+#!/usr/bin/env python3
+
+import selectors, time
+
+import timers
+
+class EventLoop:
+    """
+    A small event loop over the selectors module (epoll on Linux). Callbacks run when a file
+    becomes readable or writable and when a timer's deadline comes, and the loop sleeps exactly
+    until the next deadline rather than polling. Hooks registered with at_end_of_pass run after
+    every pass, which is where batched work such as queued packets gets flushed.
+    Attributes
+    ----------
+    selector : BaseSelector
+        The selector that waits on our files.
+    handlers : dict
+        The [reader, writer] callbacks of each file we wait on, either of which may be None.
+    always_ready : set
+        The files the selector refused, such as regular files with epoll. Like select() does, we
+        take them to be ready all the time.
+    timers : TimerQueue
+        The deadline of each pending timer, by key.
+    callbacks : dict
+        The callback of each pending timer, by key.
+    hooks : list
+        The callbacks run at the end of every pass.
+    time : function
+        The clock the loop and everything running on it tells the time by.
+    running : Boolean
+        Whether run() should keep going.
+    """
+    def __init__(self, clock=time.time):
+        self.selector = selectors.DefaultSelector()
+        self.handlers = {}
+        self.always_ready = set()
+        self.timers = timers.TimerQueue()
+        self.callbacks = {}
+        self.hooks = []
+        self.time = clock
+        self.running = False
+
+    def watch(self, fileobj, index, callback):
+        """ Sets the reader (index 0) or writer (index 1) callback of the given file. """
+        handlers = self.handlers.get(fileobj, [None, None])
+        if handlers[index] is callback:
+            return
+        handlers[index] = callback
+        events = (selectors.EVENT_READ if handlers[0] else 0) | (selectors.EVENT_WRITE if handlers[1] else 0)
+        if fileobj in self.always_ready:
+            if not events:
+                self.always_ready.discard(fileobj)
+                del self.handlers[fileobj]
+                return
+        elif fileobj in self.handlers:
+            if events:
+                self.selector.modify(fileobj, events)
+            else:
+                self.selector.unregister(fileobj)
+                del self.handlers[fileobj]
+                return
+        elif events:
+            try:
+                self.selector.register(fileobj, events)
+            except PermissionError:
+                self.always_ready.add(fileobj)
+        else:
+            return
+        self.handlers[fileobj] = handlers
+
+    def add_reader(self, fileobj, callback):
+        """ Calls the given callback whenever the given file is readable. """
+        self.watch(fileobj, 0, callback)
+
+    def remove_reader(self, fileobj):
+        self.watch(fileobj, 0, None)
+
+    def add_writer(self, fileobj, callback):
+        """ Calls the given callback whenever the given file is writable. """
+        self.watch(fileobj, 1, callback)
+
+    def remove_writer(self, fileobj):
+        self.watch(fileobj, 1, None)
+
+    def call_at(self, key, deadline, callback):
+        """ Calls the given callback at the given time, replacing any other timer with this key. """
+        self.timers.schedule(key, deadline)
+        self.callbacks[key] = callback
+
+    def cancel(self, key):
+        """ Stops the timer with the given key, if there is one. """
+        self.timers.cancel(key)
+        self.callbacks.pop(key, None)
+
+    def at_end_of_pass(self, callback):
+        """ Calls the given callback at the end of every pass of the loop. """
+        self.hooks.append(callback)
+
+    def stop(self):
+        """ Makes run() return once the current pass is over. """
+        self.running = False
+
+    def run_once(self):
+        """ Waits for the next file event or deadline, then runs everything that is due. """
+        deadline = self.timers.next_deadline()
+        timeout = None if deadline is None else max(0, deadline - self.time())
+        if self.always_ready:
+            timeout = 0
+        ready = [(key.fileobj, events) for key, events in self.selector.select(timeout)]
+        ready += [(fileobj, selectors.EVENT_READ | selectors.EVENT_WRITE) for fileobj in self.always_ready]
+        for fileobj, events in ready:
+            handlers = self.handlers.get(fileobj)
+            # A callback earlier in this pass may have stopped watching the file
+            if handlers and events & selectors.EVENT_READ and handlers[0]:
+                handlers[0]()
+            handlers = self.handlers.get(fileobj)
+            if handlers and events & selectors.EVENT_WRITE and handlers[1]:
+                handlers[1]()
+        for key in self.timers.expire(self.time()):
+            # A callback earlier in this pass may have cancelled or replaced the timer
+            callback = self.callbacks.pop(key, None)
+            if callback is not None and key not in self.timers:
+                callback()
+        for hook in self.hooks:
+            hook()
+
+    def run(self):
+        """ Runs passes until stop() is called. """
+        self.running = True
+        while self.running:
+            self.run_once()
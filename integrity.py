@@ -0,0 +1,44 @@
+#!/usr/bin/env python3
+
+import zlib
+
+class Algorithm:
+    """
+    A checksum algorithm the wire formats can protect packets with.
+    Attributes
+    ----------
+    id : int
+        The value identifying this algorithm in a packet header.
+    name : str
+        The name this algorithm is selected by on the command line.
+    func : function
+        A zlib-style running checksum function taking the data and the value so far.
+    initial : int
+        The value the running checksum starts from.
+    """
+    def __init__(self, id, name, func, initial):
+        self.id = id
+        self.name = name
+        self.func = func
+        self.initial = initial
+
+    def compute(self, *chunks):
+        """
+        Calculates the checksum over the given chunks of bytes as if they were concatenated,
+        without copying them together first.
+        """
+        value = self.initial
+        for chunk in chunks:
+            value = self.func(chunk, value)
+        return value
+
+# The checksum algorithms we support. CRC32 and Adler-32 both run in C inside zlib. "none" turns
+# corruption detection off entirely and is only meant for measuring the cost of the others.
+ALGORITHMS = { alg.name: alg for alg in (
+    Algorithm(1, "crc32", zlib.crc32, 0),
+    Algorithm(2, "adler32", zlib.adler32, 1),
+    Algorithm(0, "none", lambda data, value: 0, 0),
+) }
+BY_ID = { alg.id: alg for alg in ALGORITHMS.values() }
+
+DEFAULT = "crc32"
@@ -0,0 +1,64 @@
+#!/usr/bin/env python3
+
+import collections, os
+
+class OutputBuffer:
+    """
+    Gathers data on its way to a file descriptor so that many pieces go out in a single writev()
+    call. The descriptor is made non-blocking: when it cannot take everything, the rest stays
+    pending and is written once select() reports it writable, so a slow reader never blocks us.
+    The descriptor is often shared with whoever started us, so close() puts it back the way we
+    found it.
+    Attributes
+    ----------
+    fd : int
+        The file descriptor we write to.
+    chunks : deque
+        The pieces of data waiting to be written, in order.
+    pending : int
+        How many bytes are waiting to be written.
+    max_chunks : int
+        The most pieces a single writev() call takes.
+    blocking : bool
+        Whether the descriptor was blocking before we took it over.
+    """
+    max_chunks = 1024
+
+    def __init__(self, fd):
+        self.fd = fd
+        self.chunks = collections.deque()
+        self.pending = 0
+        self.blocking = os.get_blocking(fd)
+        os.set_blocking(fd, False)
+
+    def __len__(self):
+        return len(self.chunks)
+
+    def write(self, data):
+        """ Queues the given data to be written on the next flush. """
+        self.chunks.append(data)
+        self.pending += len(data)
+
+    def flush(self):
+        """
+        Writes as much of the pending data as the descriptor takes in one writev() call of at
+        most max_chunks pieces. Returns how many bytes were written.
+        """
+        if not self.chunks:
+            return 0
+        try:
+            written = os.writev(self.fd, [self.chunks[i] for i in range(min(len(self.chunks), self.max_chunks))])
+        except BlockingIOError:
+            return 0
+        self.pending -= written
+        left = written
+        while left and left >= len(self.chunks[0]):
+            left -= len(self.chunks.popleft())
+        if left:
+            # The last piece only went out in part, so keep the rest of it
+            self.chunks[0] = memoryview(self.chunks[0])[left:]
+        return written
+
+    def close(self):
+        """ Gives the descriptor back its original blocking mode. Anything still pending is lost. """
+        os.set_blocking(self.fd, self.blocking)
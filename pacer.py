@@ -0,0 +1,48 @@
+#!/usr/bin/env python3
+
+class Pacer:
+    """
+    Spaces out transmissions with a token bucket. Tokens accrue at the pacing rate up to the burst
+    size and every message sent takes one. A message that has to go out while the bucket is empty,
+    such as a fast retransmit, puts it in debt, which delays the messages after it instead.
+    Attributes
+    ----------
+    rate : double
+        The pacing rate in messages per second, or None before we know enough to pace.
+    burst : int
+        The most messages that may go out back to back.
+    tokens : double
+        How many messages may go out right now.
+    updated : double
+        When the tokens were last brought up to date, or None before they ever were.
+    """
+    def __init__(self, burst=2):
+        self.rate = None
+        self.burst = burst
+        self.tokens = burst
+        self.updated = None
+
+    def refill(self, now):
+        """ Adds the tokens that accrued since the last update. """
+        if self.rate is not None and self.updated is not None:
+            self.tokens = min(self.burst, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+
+    def set_rate(self, rate, now):
+        """ Changes the pacing rate from now on. """
+        self.refill(now)
+        self.rate = rate
+
+    def delay(self, now):
+        """ Returns how long until the next message may go out, which is zero if it may right away. """
+        self.refill(now)
+        # Rounding can leave the bucket a hair short of a token, and a delay that small would
+        # never pass on a clock that only moves from one event to the next
+        if self.rate is None or self.tokens >= 1 - 1e-9:
+            return 0
+        return (1 - self.tokens) / self.rate
+
+    def consume(self, now):
+        """ Takes a token for a message that is going out. """
+        self.refill(now)
+        self.tokens -= 1
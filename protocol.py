@@ -0,0 +1,161 @@
+#!/usr/bin/env python3
+
+import base64, json, struct
+
+import integrity
+
+# Version byte that starts every binary packet. A JSON packet always starts with '{', so the
+# receiver can tell the two formats apart from the first byte alone.
+VERSION = 1
+
+# The largest datagram the network will carry for us
+MAX_PACKET_SIZE = 1500
+
+# Packet types, as they appear in the binary header
+TYPES = { "msg": 0, "ack": 1, "fin": 2 }
+TYPE_NAMES = { value: name for name, value in TYPES.items() }
+
+# The most SACK ranges a single ACK reports
+MAX_SACK_BLOCKS = 8
+
+class JsonCodec:
+    """
+    The original JSON wire format, kept as a fallback. JSON cannot carry raw bytes, so the payload
+    travels base64-encoded.
+    Attributes
+    ----------
+    name : str
+        The name this format is selected by on the command line.
+    data_size : int
+        The remaining space for data in our packets, before base64 grows it by a third.
+    checksum : Algorithm
+        The checksum algorithm we protect the packets we encode with.
+    """
+    name = "json"
+    data_size = 1050
+
+    def __init__(self, checksum=integrity.ALGORITHMS[integrity.DEFAULT]):
+        self.checksum = checksum
+
+    def compute(self, alg, msg):
+        """ Calculates the checksum over every field of the given message but the checksum itself. """
+        return alg.compute(json.dumps(msg, sort_keys=True).encode('utf-8'))
+
+    def encode_parts(self, msg):
+        """ Encodes the given message dictionary into a list of buffers to be sent together. """
+        return [self.encode(msg)]
+
+    def encode(self, msg):
+        """ Encodes the given message dictionary into bytes. """
+        msg = dict(msg, alg=self.checksum.name)
+        if "data" in msg:
+            msg["data"] = base64.b64encode(msg["data"]).decode('ascii')
+        msg["cs"] = self.compute(self.checksum, msg)
+        return json.dumps(msg).encode('utf-8')
+
+    def decode(self, packet):
+        """
+        Decodes the given bytes into a message dictionary. Raises a ValueError if the packet is
+        corrupt.
+        """
+        msg = json.loads(packet.decode('utf-8'))
+        cs = msg.pop("cs")
+        if cs != self.compute(integrity.ALGORITHMS[msg["alg"]], msg):
+            raise ValueError("checksum mismatch")
+        del msg["alg"]
+        if "data" in msg:
+            msg["data"] = base64.b64decode(msg["data"], validate=True)
+        return msg
+
+class BinaryCodec:
+    """
+    A fixed-layout binary wire format. Every packet starts with a header of version, type,
+    checksum algorithm, sequence number, payload length and checksum, followed by the payload.
+    The payload of an ACK is its cumulative ack point and advertised window, followed by its list
+    of SACK ranges. A FIN has no payload.
+    Attributes
+    ----------
+    name : str
+        The name this format is selected by on the command line.
+    header : Struct
+        The layout of the packet header.
+    ack : Struct
+        The layout of the fixed fields at the start of an ACK payload.
+    block : Struct
+        The layout of a single SACK range in an ACK.
+    data_size : int
+        The remaining space for data in our packets.
+    checksum : Algorithm
+        The checksum algorithm we protect the packets we encode with.
+    """
+    name = "binary"
+    header = struct.Struct("!BBBIHI")
+    ack = struct.Struct("!II")
+    block = struct.Struct("!II")
+    data_size = MAX_PACKET_SIZE - header.size
+
+    def __init__(self, checksum=integrity.ALGORITHMS[integrity.DEFAULT]):
+        self.checksum = checksum
+
+    def compute(self, alg, msg_type, seq, payload):
+        """ Calculates the checksum over the header fields and the payload. """
+        return alg.compute(self.header.pack(VERSION, msg_type, alg.id, seq, len(payload), 0), payload)
+
+    def encode(self, msg):
+        """ Encodes the given message dictionary into bytes. """
+        return b"".join(self.encode_parts(msg))
+
+    def encode_parts(self, msg):
+        """
+        Encodes the given message dictionary into a list of buffers to be sent together: the
+        header, then the payload. The data of a message is passed through as is rather than
+        copied, so it may be a memoryview.
+        """
+        msg_type = TYPES[msg["type"]]
+        if msg_type == TYPES["ack"]:
+            payload = self.ack.pack(msg["cum"], msg["rwnd"]) + b"".join(self.block.pack(lo, hi) for lo, hi in msg["sack"])
+        elif msg_type == TYPES["fin"]:
+            payload = b""
+        else:
+            payload = msg["data"]
+        cs = self.compute(self.checksum, msg_type, msg["id"], payload)
+        return [self.header.pack(VERSION, msg_type, self.checksum.id, msg["id"], len(payload), cs), payload]
+
+    def decode(self, packet):
+        """
+        Decodes the given bytes into a message dictionary. Raises a ValueError if the packet is
+        corrupt.
+        """
+        if len(packet) < self.header.size:
+            raise ValueError("short packet")
+        version, msg_type, alg_id, seq, length, cs = self.header.unpack_from(packet)
+        payload = packet[self.header.size:]
+        if version != VERSION or msg_type not in TYPE_NAMES or alg_id not in integrity.BY_ID or length != len(payload):
+            raise ValueError("malformed header")
+        if msg_type == TYPES["ack"] and (length < self.ack.size or (length - self.ack.size) % self.block.size != 0):
+            raise ValueError("malformed ACK")
+        if msg_type == TYPES["fin"] and length != 0:
+            raise ValueError("malformed FIN")
+        if cs != self.compute(integrity.BY_ID[alg_id], msg_type, seq, payload):
+            raise ValueError("checksum mismatch")
+
+        msg = { "id": seq, "type": TYPE_NAMES[msg_type] }
+        if msg_type == TYPES["ack"]:
+            msg["cum"], msg["rwnd"] = self.ack.unpack_from(payload)
+            msg["sack"] = [list(block) for block in self.block.iter_unpack(payload[self.ack.size:])]
+        elif msg_type == TYPES["msg"]:
+            msg["data"] = payload
+        return msg
+
+FORMATS = { codec.name: codec for codec in (BinaryCodec, JsonCodec) }
+
+# Codecs using the default checksum, for decoding whatever arrives and answering it
+CODECS = { name: codec() for name, codec in FORMATS.items() }
+
+def detect(packet):
+    """ Returns the codec the given packet was encoded with, based on its first byte. """
+    if packet[:1] == b"{":
+        return CODECS["json"]
+    if packet[:1] == bytes([VERSION]):
+        return CODECS["binary"]
+    raise ValueError("unknown packet format")
@@ -1,44 +1,106 @@
 #!/usr/bin/env python3
 
-import argparse, socket, time, json, select, struct, sys, math, functools
+import argparse, sys
+
+import datagram, eventloop, output, protocol, reorder
 
 class Receiver:
     """
     Represents the party recieving messages.
     Attributes
     ----------
-    socket : socket
+    socket : DatagramSocket
         The socoket we will be listening and sending messages with.
+    loop : EventLoop
+        The event loop we run on.
     port : int
         The port number we bind to.
     remote_host : str
         The address of the remote host we are recieving messages from.
     remote_port : int
         The port of the remote host.
+    codec : JsonCodec or BinaryCodec
+        The wire format the Sender talks to us in, which we answer in as well.
     printed_id : int
-        ID of the message last recieved.
-    received_msgs : dict
-        Dictionary that stores messages with their message ID as the key.
+        ID of the last message printed. Every message up to it has been recieved, so it is
+        our cumulative ack point.
+    reorder : ReorderBuffer
+        The messages we have received but cannot print yet because an earlier one is missing.
+    output : OutputBuffer
+        The messages we have printed that standard output has yet to take.
+    advertised : int
+        The window we last advertised to the Sender.
+    ack_every : int
+        How many data packets we may receive before we have to ACK them.
+    ack_delay : double
+        How long, in seconds, an ACK may be held back waiting for more packets.
+    unacked : int
+        How many new data packets we have received since our last ACK.
+    ack_due : Boolean
+        Whether an ACK is waiting on the delayed ACK timer.
+    last_id : int
+        The ID of the message the next ACK is for.
+    fin_id : int
+        The ID of the Sender's FIN, which ends the stream once every message before it has been
+        printed, or None before it arrives.
+    linger : double
+        How long, in seconds, we keep answering the Sender's FIN after it last arrived.
+    closing : Boolean
+        Whether the linger is over, so we exit as soon as our output is written.
     """
-    printed_id = 0
-    received_msgs = {}
-    def __init__(self):
+    def __init__(self, window=1024, loop=None, sock=None, sink=None, ack_every=2, ack_delay=0.04,
+                 linger=6.0):
         """
         Initializes our Reciever object.
+        Parameters
+        ----------
+        window : int
+            How many messages past the last printed one we have room to hold.
+        loop : EventLoop
+            The event loop to run on, or None for a new one on the system clock.
+        sock : DatagramSocket
+            The socket to receive on, or None for a new one. Its port is only logged if we
+            create it.
+        sink : OutputBuffer
+            Where printed data goes, or None for standard output.
+        ack_every : int
+            ACK at least every this many data packets.
+        ack_delay : double
+            ACK at most this long after a data packet.
+        linger : double
+            How long to stay around after the end of the stream, in case our ACK of the FIN is
+            lost and the Sender resends it.
         """
-        self.socket = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
-        self.socket.bind(('0.0.0.0', 0))
-        self.port = self.socket.getsockname()[1]
-        self.log("Bound to port %d" % self.port)
+        self.loop = loop if loop is not None else eventloop.EventLoop()
+        self.port = None
+        if sock is None:
+            sock = datagram.DatagramSocket()
+            self.port = sock.getsockname()[1]
+            self.log("Bound to port %d" % self.port)
+        self.socket = sock
 
         self.remote_host = None
         self.remote_port = None
+        self.codec = None
+        self.printed_id = 0
+        self.reorder = reorder.ReorderBuffer(window)
+        self.output = sink if sink is not None else output.OutputBuffer(sys.stdout.fileno())
+        self.advertised = None
+        self.ack_every = ack_every
+        self.ack_delay = ack_delay
+        self.unacked = 0
+        self.ack_due = False
+        self.last_id = 0
+        self.fin_id = None
+        self.linger = linger
+        self.closing = False
 
     def send(self, message):
         """
-        Sends the given message to our current remote host.
+        Sends the given message to our current remote host. It goes out with the rest of this loop
+        iteration's packets.
         """
-        self.socket.sendto(json.dumps(message).encode('utf-8'), (self.remote_host, self.remote_port))
+        self.socket.sendto(self.codec.encode(message), (self.remote_host, self.remote_port))
 
     def log(self, message):
         """
@@ -47,65 +109,207 @@ class Receiver:
         sys.stderr.write(message + "\n")
         sys.stderr.flush()
 
-    def checksum256(self, st):
+    def advertised_window(self):
         """
-        Calculates a checksum value for the given string.
+        Returns how many messages past the last printed one the Sender may send: every slot of
+        the reorder buffer, less the printed messages standard output has yet to take.
         """
-        return functools.reduce(lambda x,y:x+y, map(ord, st)) % 256
-    
+        return max(0, self.reorder.capacity - len(self.output))
+
+    def make_ack(self, msg_id, sack_for):
+        """
+        Builds an ACK for the given message, along with how far we have printed, how much further
+        the Sender may go, and the ranges we hold past the next hole, with the range holding
+        sack_for first.
+        """
+        self.advertised = self.advertised_window()
+        return { "id": msg_id, "type": "ack", "cum": self.printed_id, "rwnd": self.advertised,
+                 "sack": self.sack_blocks(sack_for) }
+
+    def send_ack(self):
+        """
+        Sends one ACK covering every data packet received since the last one, and stops the
+        delayed ACK timer. The cumulative ack point and the SACK ranges describe everything we
+        hold, so no packet goes unreported for not having had an ACK of its own.
+        """
+        self.loop.cancel("ack")
+        self.unacked = 0
+        self.ack_due = False
+        self.send(self.make_ack(self.last_id, self.last_id))
+
+    def delay_ack(self):
+        """ Makes sure an ACK goes out within ack_delay, unless one is sent before then. """
+        if not self.ack_due:
+            self.ack_due = True
+            self.loop.call_at("ack", self.loop.time() + self.ack_delay, self.send_ack)
+
+    def sack_blocks(self, msg_id):
+        """
+        Builds the SACK ranges of the messages we hold beyond the last printed one. The range
+        holding the given message comes first, and at most MAX_SACK_BLOCKS ranges are returned.
+        """
+        blocks = []
+        for i in self.reorder.held():
+            if blocks and blocks[-1][1] == i - 1:
+                blocks[-1][1] = i
+            else:
+                blocks.append([i, i])
+        blocks.sort(key=lambda block: not block[0] <= msg_id <= block[1])
+        return blocks[:protocol.MAX_SACK_BLOCKS]
+
     def print_msgs(self):
         """
-        Prints out the last recieved message.
+        Prints out every message we can, in order, freeing their slots in the reorder buffer. The
+        data is only queued here; run() writes it all out at once.
         """
-        while self.printed_id +1 in self.received_msgs:
+        data = self.reorder.pop()
+        while data is not None:
             self.printed_id += 1
-            # Print out the data to stdout
-            print(self.received_msgs[self.printed_id]["data"], end='', flush=True)
+            self.output.write(data)
+            data = self.reorder.pop()
+        if self.fin_id == self.printed_id + 1:
+            # Everything the Sender sent has been printed, so our cumulative ack point moves past
+            # the FIN, which acknowledges it
+            self.printed_id = self.fin_id
+            self.log("End of stream")
+            self.linger_on()
+
+    def ended(self):
+        """ Returns whether the Sender's FIN has arrived and everything before it is printed. """
+        return self.fin_id is not None and self.printed_id == self.fin_id
+
+    def linger_on(self):
+        """ (Re)starts the linger, which we wait out before we exit. """
+        self.loop.call_at("linger", self.loop.time() + self.linger, self.linger_over)
+
+    def linger_over(self):
+        """ Lets us exit as soon as our output is written. """
+        self.closing = True
+
+    def receive_fin(self, msg):
+        """
+        Handles the Sender's FIN. We note where the stream ends, and answer right away, even with
+        messages still missing before it, since the ACK reports those as well.
+        """
+        self.log("Received FIN %d" % msg["id"])
+        if self.fin_id is None and msg["id"] > self.printed_id:
+            self.fin_id = msg["id"]
+            self.print_msgs()
+        elif self.ended():
+            # Our ACK of the FIN must have been lost, so we stay around for a while longer
+            self.linger_on()
+        self.last_id = msg["id"]
+        self.send_ack()
     
+    def receive_msgs(self):
+        """ Handles every packet waiting on our socket. """
+        for data, addr in self.socket.drain():
+            self.receive_msg(data, addr)
+
+    def receive_msg(self, data, addr):
+        """ Handles the given packet from the given address. """
+        try:
+            # Grab the remote host/port if we don't already have it
+            if self.remote_host is None:
+                self.remote_host = addr[0]
+                self.remote_port = addr[1]
+
+            # Decode the data in whichever format the Sender chose. If the checksum is not
+            # correct, the codec raises and we drop the corrupted packet below.
+            codec = protocol.detect(data)
+            msg = codec.decode(data)
+            if msg["type"] == "fin":
+                self.codec = codec
+                self.receive_fin(msg)
+                return
+            if msg["type"] != "msg":
+                raise ValueError("unexpected message type")
+            self.codec = codec
+
+            self.log("Received data message %d (%d bytes)" % (msg["id"], len(msg["data"])))
+            self.last_id = msg["id"]
+            immediate = False
+            held = len(self.reorder)
+            if msg["id"] > self.printed_id + self.advertised_window() and msg["id"] not in self.reorder:
+                # There is no room for the message, so we drop it and must not ACK it. The
+                # Sender still learns where we are from the rest of the ACK.
+                self.log("No room for message %d (window %d)" % (msg["id"], self.advertised_window()))
+                self.last_id = self.printed_id
+                immediate = True
+            elif self.reorder.insert(msg["id"], msg["data"]):
+                # If the current msg is new, print out everything we can
+                self.print_msgs()
+                self.unacked += 1
+                # Like TCP, we ACK right away whenever the Sender should hear about a hole: when
+                # a message arrives out of order and when it fills a hole.
+                immediate = held > 0 or len(self.reorder) > 0
+
+            # Otherwise we ACK every ack_every new packets, or once ack_delay has passed. A
+            # duplicate tells the Sender nothing new, so it only makes sure an ACK is coming. The
+            # ACK is only queued, so it still goes out after the data it reports is written at the
+            # end of the pass.
+            if immediate or self.unacked >= self.ack_every:
+                self.send_ack()
+            else:
+                self.delay_ack()
+        except (ValueError, KeyError, TypeError):
+            # Another way to check if our message is corrupt. Here, we check if decoding
+            # the msg caused an error. If so, we catch the exception and log as such.
+            self.log("corrupt msg")
+
+    def end_pass(self):
+        """
+        Runs at the end of every pass of the event loop. Writes out everything printed during the
+        pass in one go, and only then sends the pass's ACKs, so no ACK reports data before it is
+        written. Stops the loop once the linger is over and all our output is written.
+        """
+        self.output.flush()
+        if self.advertised == 0 and self.advertised_window() > 0:
+            # Standard output caught up after we told the Sender to stop, so tell it to go on
+            self.last_id = self.printed_id
+            self.send_ack()
+        self.socket.flush()
+        if self.closing and len(self.output) == 0:
+            self.loop.stop()
+            return
+        self.watch_output()
+
+    def watch_output(self):
+        """ Waits for standard output to become writable, but only while it has fallen behind. """
+        if self.output.pending:
+            self.loop.add_writer(self.output.fd, self.output.flush)
+        else:
+            self.loop.remove_writer(self.output.fd)
+
+    def start(self):
+        """ Sets us up on our event loop, which the caller then runs. """
+        self.loop.add_reader(self.socket, self.receive_msgs)
+        self.loop.at_end_of_pass(self.end_pass)
+
     def run(self):
         """
         Our main method that runs our Receiver object.
         """
-        while True:
-            socks = select.select([self.socket], [], [])[0]
-            for conn in socks:
-                try:
-                    data, addr = conn.recvfrom(65535)
-
-                    # Grab the remote host/port if we don't already have it
-                    if self.remote_host is None:
-                        self.remote_host = addr[0]
-                        self.remote_port = addr[1]
-
-                    # Decode the data which should be in the JSON format.
-                    msg = json.loads(data.decode('utf-8'))
-
-                    if msg["cs"] != self.checksum256(msg["data"]):
-                        # If our checksum is not correct, we have a corrupted packet and thus drop it.
-                        self.log("corrupt msg")
-                        continue
-
-                    if not(msg["id"] in self.received_msgs): 
-                        # If the current msg is new, we put it into received_msgs and print it out.
-                        self.received_msgs[msg["id"]] = msg
-                        self.print_msgs()
-                    
-                    self.log("Received data message %s" % msg)
-                        
-                    # Always send back an ack
-                    self.send({ "id": msg["id"], "type": "ack" })
-                except (ValueError, KeyError, TypeError):
-                    # Another way to check if our message is corrupt. Here, we check if decoding
-                    # if the msg in JSON caused an error. If so, we catch the exception and log as such.
-                    self.log("corrupt msg")
-
-        return
+        self.start()
+        try:
+            self.loop.run()
+        finally:
+            self.output.close()
 
 if __name__ == "__main__":
     """
     Here, we parse the arguments given and start our Receiver object.
     """
     parser = argparse.ArgumentParser(description='receive data')
+    parser.add_argument('--window', type=int, default=1024,
+                        help="Messages past the last printed one we have room to hold")
+    parser.add_argument('--ack-every', type=int, default=2,
+                        help="ACK at least every this many data packets")
+    parser.add_argument('--ack-delay', type=float, default=0.04,
+                        help="Longest time in seconds an ACK may be held back")
+    parser.add_argument('--linger', type=float, default=6.0,
+                        help="Seconds to keep answering the Sender's FIN before exiting")
     args = parser.parse_args()
-    sender = Receiver()
+    sender = Receiver(args.window, ack_every=args.ack_every, ack_delay=args.ack_delay,
+                      linger=args.linger)
     sender.run()
@@ -0,0 +1,66 @@
+#!/usr/bin/env python3
+
+class ReorderBuffer:
+    """
+    Holds the data of messages that arrived ahead of the next one we expect, in a fixed number of
+    slots indexed by message ID modulo the capacity. Only the IDs from the next expected one up to
+    capacity - 1 past it have a slot, so memory stays bounded however long the transfer runs.
+    Attributes
+    ----------
+    capacity : int
+        How many messages the buffer can hold.
+    slots : list
+        The data of each message we hold, or None for an empty slot.
+    next_id : int
+        The ID of the next message to be taken out of the buffer.
+    highest : int
+        The highest message ID we hold, or next_id - 1 if we hold none.
+    count : int
+        How many messages we hold.
+    """
+    def __init__(self, capacity=1024):
+        self.capacity = capacity
+        self.slots = [None] * capacity
+        self.next_id = 1
+        self.highest = 0
+        self.count = 0
+
+    def __len__(self):
+        return self.count
+
+    def __contains__(self, msg_id):
+        return self.accepts(msg_id) and self.slots[msg_id % self.capacity] is not None
+
+    def accepts(self, msg_id):
+        """ Returns whether the given message ID falls within the buffer's window. """
+        return self.next_id <= msg_id < self.next_id + self.capacity
+
+    def insert(self, msg_id, data):
+        """
+        Stores the data of the given message. Returns False, storing nothing, if the message is a
+        duplicate or falls outside the window.
+        """
+        if not self.accepts(msg_id) or msg_id in self:
+            return False
+        self.slots[msg_id % self.capacity] = data
+        self.highest = max(self.highest, msg_id)
+        self.count += 1
+        return True
+
+    def pop(self):
+        """ Takes out and returns the data of the next message, or None if it has not arrived. """
+        slot = self.next_id % self.capacity
+        data = self.slots[slot]
+        if data is None:
+            return None
+        self.slots[slot] = None
+        self.next_id += 1
+        self.highest = max(self.highest, self.next_id - 1)
+        self.count -= 1
+        return data
+
+    def held(self):
+        """ Yields the IDs of the messages we hold, in order. """
+        for msg_id in range(self.next_id, self.highest + 1):
+            if self.slots[msg_id % self.capacity] is not None:
+                yield msg_id
@@ -1,9 +1,37 @@
 #!/usr/bin/env python3
 
-import argparse, socket, time, json, select, sys, functools
+import argparse, sys
 
-# The remaining space for for data in our packets
-DATA_SIZE = 1450
+import congestion, datagram, estimator, eventloop, integrity, pacer, protocol, timers
+
+class Outstanding:
+    """
+    A message waiting for an ACK. It is encoded once, when it is first sent, and every retransmit
+    sends the same buffers.
+    Attributes
+    ----------
+    id : int
+        The ID of the message.
+    packet : list
+        The encoded buffers of the message.
+    size : int
+        How many bytes of data the message carries.
+    sent : double
+        When the message was first sent, or None before it has been.
+    retransmitted : Boolean
+        Whether the message has been sent more than once.
+    transmission : int
+        The number of its latest transmission, counting every message we have sent.
+    """
+    __slots__ = ("id", "packet", "size", "sent", "retransmitted", "transmission")
+
+    def __init__(self, msg_id, packet, size):
+        self.id = msg_id
+        self.packet = packet
+        self.size = size
+        self.sent = None
+        self.retransmitted = False
+        self.transmission = 0
 
 class Sender:
     """
@@ -14,39 +42,85 @@ class Sender:
         The value of the remote host that the Sender will connect to.
     port : int
         The UDP port number to connect to.
-    socket : socket
+    socket : DatagramSocket
         The socket object that this Sender will use to send messages with.
+    loop : EventLoop
+        The event loop we run on, whose clock we tell the time by.
+    codec : JsonCodec or BinaryCodec
+        The wire format we encode our packets with. The Receiver answers in the same format.
+    dupthresh : int
+        How many messages past a hole must be acknowledged before we resend it without waiting
+        for its retransmission timer.
     
     id_generator : int
         The current ID of our packets.
-    window : int
-        The current size of our sliding window.
-    target_window : int
-        The target size of our sliding window.
-    last_msg_sent_time : int
-        The time value of the message we last sent.
+    cc : CongestionController
+        Decides how many messages we may keep in flight.
+    rwnd_edge : int
+        The right edge of the Receiver's advertised window: the highest message ID it has room
+        for, which is its cumulative ack point plus the window it advertised, or None before its
+        first ACK.
+    pacer : Pacer
+        Spaces out our messages at the congestion window per smoothed RTT, so a whole window does
+        not hit the bottleneck buffer at once.
     msg_waiting_ack : dict
-        A dictionary of message IDs that hve not been ACK'd yet.
-    rtt : double
-        The current estimated Round Trip Time (RTT)
+        The Outstanding record of each message that has not been ACK'd yet, by message ID.
+    lost : dict
+        The IDs of the messages waiting for an ACK that we presume lost and have yet to resend, in
+        the order they are to be resent. They no longer count as in flight.
+    timers : TimerQueue
+        The retransmission timer of each message waiting for an ACK, by message ID.
+    input : RawIOBase
+        Where the data we send comes from, STDIN unless told otherwise. STDIN is read without its
+        buffer, which would hold a read back until it had a whole message's worth.
+    input_block : bytearray
+        The block our input is read into. The data of each message is a slice of a block, which stays
+        alive for as long as any of its messages are.
+    input_pos : int
+        Where in the block the next message's data will be read to.
+    input_block_msgs : int
+        How many messages' worth of data a block holds.
+    cum_acked : int
+        The Receiver's cumulative ack point: every message up to and including it has arrived.
+    highest_sacked : int
+        The highest message ID the Receiver has reported holding in a SACK range. Anything still
+        waiting for an ACK below it is a hole.
+    transmissions : int
+        How many times we have sent a message, counting every retransmit.
+    backed_off_at : int
+        How many transmissions we had made when the time out was last doubled.
+    last_sent : double
+        When we last sent a message, or None before we have.
+    probed : Boolean
+        Whether we have sent a tail loss probe since an ACK last released a message or the time
+        out was last doubled.
+    rtt : RttEstimator
+        Our estimate of the Round Trip Time (RTT) and the retransmission time out.
     finished : Boolean
         Represents whether or not the Sender is finished sending packets or not.
+    linger : double
+        How long, in seconds, we keep resending our FIN once all our data has been acknowledged.
+    lingering : Boolean
+        Whether only our FIN is left to be acknowledged, so the linger has started.
     waiting : Boolean
         Represents whether or not we are waiting for an ACK from the Reciever.
-    alpha : double
-        Alpha coefficient.
+    timer_keys : tuple
+        The keys of every timer we set on the event loop.
     """
     id_generator = 0
-    window = 4
-    target_window = 16
-    last_msg_sent_time = 0
-    msgs_waiting_ack = {}
-    rtt = 0.5
+    cum_acked = 0
+    highest_sacked = 0
+    transmissions = 0
+    backed_off_at = 0
+    last_sent = None
+    probed = False
     finished = False
     waiting = False
-    alpha = 0.875
+    timer_keys = ("pace", "rto", "probe", "linger")
+    input_block_msgs = 64
 
-    def __init__(self, host, port):
+    def __init__(self, host, port, wire_format="binary", checksum=integrity.DEFAULT, dupthresh=3,
+                 cc=congestion.DEFAULT, linger=3.0, loop=None, sock=None, source=None):
         """
         Parameters
         ----------
@@ -54,123 +128,409 @@ class Sender:
             The value of the remote host that the Sender will connect to.
         port : int
             The UDP port number to connect to.
+        wire_format : str
+            The name of the wire format to encode our packets with.
+        checksum : str
+            The name of the checksum algorithm to protect our packets with.
+        dupthresh : int
+            How many messages past a hole must be acknowledged before we fast retransmit it.
+        cc : str
+            The name of the congestion controller to pace ourselves with.
+        linger : double
+            How long to wait for the FIN to be acknowledged once everything else has been.
+        loop : EventLoop
+            The event loop to run on, or None for a new one on the system clock.
+        sock : DatagramSocket
+            The socket to send with, or None for a new one.
+        source : RawIOBase
+            The binary file to read the data to send from, or None for STDIN.
         """
         self.host = host
         self.remote_port = int(port)
+        self.codec = protocol.FORMATS[wire_format](integrity.ALGORITHMS[checksum])
+        self.dupthresh = dupthresh
         self.log("Sender starting up using port %s" % self.remote_port)
-        self.socket = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
-        self.socket.bind(('0.0.0.0', 0))
+        self.socket = sock if sock is not None else datagram.DatagramSocket()
+        self.loop = loop if loop is not None else eventloop.EventLoop()
+        self.msgs_waiting_ack = {}
+        self.timers = timers.TimerQueue()
+        self.input = source if source is not None else sys.stdin.buffer.raw
+        self.input_block = None
+        self.input_pos = 0
+        self.rtt = estimator.RttEstimator()
+        self.cc = congestion.CONTROLLERS[cc]()
+        self.pacer = pacer.Pacer()
+        self.lost = {}
+        self.rwnd_edge = None
+        self.linger = linger
+        self.lingering = False
 
     def log(self, message):
         """ Logs the given message to standard error (STDERR). """
         sys.stderr.write(message + "\n")
         sys.stderr.flush()
 
-    def checksum256(self, st):
-        """ Calculates a checksum of the given message. """
-        return functools.reduce(lambda x,y:x+y, map(ord, st)) % 256
-    
     def send(self, message):
-        """ Sends the given message to the Reciever we are currently pointed at. """
-        self.socket.sendto(json.dumps(message).encode('utf-8'), (self.host, self.remote_port))
+        """
+        Sends the given message to the Reciever we are currently pointed at. It goes out with the
+        rest of this loop iteration's packets.
+        """
+        self.send_parts(self.codec.encode_parts(message))
 
-    def send_msg(self, msg):
+    def send_parts(self, buffers):
+        """ Sends a packet made up of the given, already encoded, buffers. """
+        self.socket.sendmsg(buffers, (self.host, self.remote_port))
+
+    def send_msg(self, record):
         """ 
-        Wrapper function for the send() function. Logs that it is sending a message and saves the
-        time of the message.
+        Sends the already encoded message of the given Outstanding record. Logs that it is sending
+        a message, saves the time of the message and (re)starts its retransmission timer.
+        """
+        self.log("Sending message %d (%d bytes)" % (record.id, record.size))
+        self.send_parts(record.packet)
+        self.transmissions += 1
+        record.transmission = self.transmissions
+        now = self.loop.time()
+        self.last_sent = now
+        self.pacer.consume(now)
+        self.lost.pop(record.id, None)
+        if record.sent is None:
+            record.sent = now
+        else:
+            record.retransmitted = True
+        self.timers.schedule(record.id, now + self.rtt.rto)
+
+    def in_flight(self):
+        """ Returns how many messages we are waiting on that we do not presume lost. """
+        return len(self.msgs_waiting_ack) - len(self.lost)
+
+    def rwnd(self):
+        """ Returns how many messages past our cumulative ack point the Receiver has room for. """
+        return max(self.rwnd_edge - self.cum_acked, 0)
+
+    def window(self):
+        """ Returns how many messages may be in flight: the smaller of the two windows. """
+        return self.cc.window() if self.rwnd_edge is None else min(self.cc.window(), self.rwnd())
+
+    def can_send(self):
+        """ Returns whether the window has room for another message. """
+        return self.in_flight() < max(self.window(), 1)
+
+    def can_send_new(self):
         """
-        self.log("Sending message '%s'" % msg)
-        self.send(msg)
-        self.last_msg_sent_time = time.time()
-        if len(self.msgs_waiting_ack) >= self.window:
-            self.waiting = True
+        Returns whether the window has room for a new message, which must also fit in the
+        Receiver's buffer. When the Receiver has no room at all, we still let one message through
+        as a probe, so its ACK tells us once it has room again.
+        """
+        if self.rwnd_edge is not None and self.id_generator >= self.cum_acked + max(self.rwnd(), 1):
+            return False
+        return self.can_send()
+
+    def expire_timers(self):
+        """
+        Marks the messages whose own retransmission timers have run out as lost and resends what
+        we can of them.
+        """
+        now = self.loop.time()
+        expired = self.timers.expire(now)
+        if expired:
+            # Every message has a timer of its own, but like RFC 6298's single timer we only
+            # double the time out when a timer armed with the current one runs out. Timers armed
+            # before the last doubling ran on the shorter time out, and doubling again for each of
+            # them would snowball.
+            latest = max(self.msgs_waiting_ack[msg_id].transmission for msg_id in expired)
+            if self.rtt.backoffs == 0 or latest > self.backed_off_at:
+                self.rtt.back_off()
+                self.backed_off_at = self.transmissions
+                # The same goes for congestion control, which would otherwise cut its threshold
+                # down to the minimum for one outage
+                self.cc.on_loss(expired[0], self.id_generator, now, timeout=True)
+                # What we resend may end up as the tail again, so it may be probed once more
+                self.probed = False
+            self.log("Retransmission time out; RTT estimator now %s, congestion control now %s"
+                     % (self.rtt.state(), self.cc.state()))
+            for msg_id in expired:
+                self.lost[msg_id] = None
+        self.retransmit_msgs()
 
     def retransmit_msgs(self):
         """
-        Retransmits the messages based on the given time and the current time out.
+        Resends lost messages for as long as the congestion window has room and the pacer allows.
+        """
+        now = self.loop.time()
+        while self.lost and self.can_send() and self.pacer.delay(now) == 0:
+            self.send_msg(self.msgs_waiting_ack[next(iter(self.lost))])
+
+    def fast_retransmit(self):
         """
-        time_elapsed = time.time() - self.last_msg_sent_time
-        if time_elapsed >= 1.75 * self.rtt:
-            i = 0
-            for msg in self.msgs_waiting_ack.values():
-                self.send_msg(msg)
-                i += 1
-                if i >= self.window:
-                    break
-        
-    def update_time_out(self):
+        Resends every hole that at least dupthresh later messages have been acknowledged past,
+        without waiting for its retransmission timer. Holes we have already resent are left to
+        their timers.
         """
-        Updates time out.
+        threshold = self.dupthresh
+        if (self.finished or not self.can_send_new()) and self.highest_sacked == self.id_generator:
+            # Early retransmit (RFC 5827): at the tail of the stream, or with the window full, no
+            # more messages are coming to be acknowledged past a hole. Once everything we sent
+            # after it has been, the hole is as good as lost.
+            threshold = 1
+
+        holes = []
+        for msg_id in self.msgs_waiting_ack:
+            if msg_id >= self.highest_sacked:
+                break
+            holes.append(msg_id)
+
+        lost = []
+        for i, msg_id in enumerate(holes):
+            # Everything between this hole and the highest SACKed message has been acknowledged,
+            # except the holes after this one. That count only shrinks as we go up.
+            if self.highest_sacked - msg_id - (len(holes) - i - 1) < threshold:
+                break
+            if not self.msgs_waiting_ack[msg_id].retransmitted:
+                lost.append(msg_id)
+
+        now = self.loop.time()
+        for msg_id in lost:
+            # Losing packets means we are sending too fast, so let congestion control back off
+            self.cc.on_loss(msg_id, self.id_generator, now)
+            self.log("Fast retransmit of message %d" % msg_id)
+            self.send_msg(self.msgs_waiting_ack[msg_id])
+
+    def probe_deadline(self):
+        """
+        Returns when to send a tail loss probe, or None if we should not. We probe when nothing
+        new can go out and the ACK of our latest message is two smoothed RTTs overdue, but only
+        once until an ACK releases a message or the time out doubles again, and only when that
+        comes before the next retransmission time out.
         """
-        self.rtt = self.alpha * self.rtt + ((1 - self.alpha) * (time.time() - self.last_msg_sent_time))
+        if self.probed or self.lost or not self.msgs_waiting_ack or self.rtt.srtt is None:
+            return None
+        if not self.finished and self.can_send_new():
+            return None
+        deadline = self.last_sent + 2 * self.rtt.srtt
+        rto = self.timers.next_deadline()
+        return deadline if rto is None or deadline < rto else None
 
-    def congestion_control(self):
+    def send_probe(self):
         """
-        Optimizes congestion of the messages.
+        Resends our highest message still waiting for an ACK (a tail loss probe, after RFC 8985),
+        without doubling the time out. Its ACK either releases the tail or shows the path is
+        working, so a lost message or ACK at the end of the stream does not have to wait for the
+        retransmission time out.
         """
-        time_elapsed = time.time() - self.last_msg_sent_time
+        if not self.msgs_waiting_ack:
+            return
+        self.probed = True
+        msg_id = next(reversed(self.msgs_waiting_ack))
+        self.log("Tail loss probe of message %d" % msg_id)
+        self.send_msg(self.msgs_waiting_ack[msg_id])
+
+    def release(self, msg_id):
+        """
+        Stops waiting for an ACK for the given message, along with its retransmission timer, and
+        takes an RTT sample from it. Returns whether we were still waiting for it.
+        """
+        record = self.msgs_waiting_ack.pop(msg_id, None)
+        if record is None:
+            return False
+        if not record.retransmitted:
+            # Following Karn's algorithm, we only sample messages that were sent once, as for the
+            # others we cannot tell which copy got through.
+            now = self.loop.time()
+            self.rtt.sample(now - record.sent)
+            self.cc.on_rtt_sample(now - record.sent, now)
+        self.lost.pop(msg_id, None)
+        self.timers.cancel(msg_id)
+        return True
+
+    def process_ack(self, msg):
+        """
+        Releases the message the given ACK is for, every message up to its cumulative ack point,
+        and every message in its SACK ranges, and tells congestion control how many that was. Also
+        takes note of the advertised window.
+        """
+        # The advertised window counts from the ACK's own cumulative ack point. An ACK that was
+        # overtaken by a newer one describes room the Receiver may since have used up, so only
+        # the newest ACKs move the window's right edge.
+        if self.rwnd_edge is None or msg["cum"] >= self.cum_acked:
+            self.rwnd_edge = msg["cum"] + msg["rwnd"]
+        backed_off = self.rtt.backoffs > 0
+        record = self.msgs_waiting_ack.get(msg["id"])
+        if record is not None and record.retransmitted and self.rtt.srtt is None:
+            # Until we have a single clean sample, timing a retransmitted message from its first
+            # copy is a safe overestimate, and it keeps a too-short initial time out from starving
+            # us of samples.
+            self.rtt.sample(self.loop.time() - record.sent)
+        released = self.release(msg["id"])
+        # The message the ACK is for has arrived, even when it is not in a SACK range, as a FIN
+        # never is
+        self.highest_sacked = max(self.highest_sacked, msg["id"])
+        # ACKs can arrive out of order, so an older cumulative ack point must not move us back
+        for msg_id in range(self.cum_acked + 1, msg["cum"] + 1):
+            released += self.release(msg_id)
+        self.cum_acked = max(self.cum_acked, msg["cum"])
+        for lo, hi in msg["sack"]:
+            for msg_id in range(lo, hi + 1):
+                released += self.release(msg_id)
+            self.highest_sacked = max(self.highest_sacked, hi)
+        if not released:
+            return
+        self.probed = False
+        now = self.loop.time()
+        self.cc.on_ack(released, now)
+        if backed_off:
+            # New data got through, so the backoff is stale. Like RFC 6298 does with its single
+            # timer, restart the timers armed with the backed-off time out.
+            self.rtt.clear_backoff()
+            for msg_id in self.msgs_waiting_ack:
+                self.timers.schedule(msg_id, now + self.rtt.rto)
+
+    def receive_ack(self, k):
+        """ Handles the given packet from the Receiver. """
+        try:
+            msg = self.codec.decode(k)
+
+            self.log("Received message '%s'" % msg)
+
+            if msg["type"] == "ack":
+                # If we recieve an ACK, remove it and everything it SACKs from the
+                # msgs_waiting_ack list.
+                self.process_ack(msg)
+        except (ValueError, KeyError, TypeError) as e:
+            # If we have an error parsing our message, that means we have a corrupted
+            # packet and we log it as such.
+            self.log(str(e))
+            self.log("corrupt msg")
+
+    def receive_acks(self):
+        """ Handles every ACK waiting on our socket, then resends what the ACKs show is lost. """
+        for k, addr in self.socket.drain():
+            self.receive_ack(k)
+        self.fast_retransmit()
+        # The ACKs may have opened up the window for messages still waiting to be resent
+        self.retransmit_msgs()
+
+    def next_chunk(self):
+        """
+        Returns the next message's worth of data to send, which is empty at the end of the data,
+        or None if there is none yet. The data is read straight into the current input block and
+        returned as a memoryview of it, so it is never copied on its way to the socket.
+        """
+        size = self.codec.data_size
+        if self.input_block is None or len(self.input_block) - self.input_pos < size:
+            self.input_block = bytearray(size * self.input_block_msgs)
+            self.input_pos = 0
+        view = memoryview(self.input_block)[self.input_pos:self.input_pos + size]
+        read = self.input.readinto(view)
+        if read is None:
+            # A non-blocking input has nothing for us after all
+            return None
+        self.input_pos += read
+        return view[:read]
+
+    def want_input(self, wanted):
+        """ Starts or stops waiting for our input to have data for us. """
+        if wanted:
+            self.loop.add_reader(self.input, self.read_input)
+        else:
+            self.loop.remove_reader(self.input)
+
+    def read_input(self):
+        """ Reads a message's worth of data from our input and sends it. """
+        data = self.next_chunk()
+        if data is None:
+            return
+        if len(data) == 0:
+            self.log("All done!")
+            self.finished = True
+            # If we have no more data to output, we set self.finished to True and tell the
+            # Receiver with a FIN. It takes the next message ID and is resent like any other
+            # message until the Receiver acknowledges it.
+            self.send_new({ "type": "fin" }, 0)
+            return
+
+        self.send_new({ "type": "msg", "data": data }, len(data))
+
+    def send_new(self, msg, size):
+        """ Gives the given message the next ID and sends it for the first time. """
+        # Increment our current message ID and encode our msg packet, once and for all.
+        self.id_generator += 1
+        msg["id"] = self.id_generator
+        record = Outstanding(self.id_generator, self.codec.encode_parts(msg), size)
+
+        # Add this message to msg_waiting_acct
+        self.msgs_waiting_ack[self.id_generator] = record
+
+        self.send_msg(record)
+
+    def give_up(self):
+        """ Stops waiting for our FIN to be acknowledged once the linger is over. """
+        self.log("No ACK for our FIN; exiting anyway")
+        self.stop()
+
+    def stop(self):
+        """
+        Cancels every timer we have set and stops the event loop. An event loop that outlives us,
+        such as an asyncio one, would otherwise still call them.
+        """
+        for key in self.timer_keys:
+            self.loop.cancel(key)
+        self.loop.stop()
+
+    def schedule(self):
+        """
+        Runs at the end of every pass of the event loop. Sends the packets of this pass and sets
+        up what wakes us next: our input if the window and the pacer have room for new data, the
+        pacer's next slot if only the pacer is holding us back, and the next retransmission time
+        out or tail loss probe. Stops the loop once everything has been acknowledged, our FIN
+        included.
+        """
+        self.socket.flush()
+        if self.finished and len(self.msgs_waiting_ack) == 0:
+            self.stop()
+            return
+
+        now = self.loop.time()
+        only_fin = len(self.msgs_waiting_ack) == 1 and self.id_generator in self.msgs_waiting_ack
+        if self.finished and not self.lingering and only_fin:
+            # All our data has arrived and only the FIN is left. Should the Receiver have gone
+            # already, we would resend it forever, so it gets linger seconds.
+            self.lingering = True
+            self.loop.call_at("linger", now + self.linger, self.give_up)
+        if self.rtt.srtt is not None:
+            self.pacer.set_rate(self.cc.pacing_rate(self.rtt.srtt), now)
+        delay = self.pacer.delay(now)
+        # New data waits until every lost message has been resent
+        self.waiting = bool(self.lost) or not self.can_send_new() or delay > 0
+        self.want_input(not self.waiting and not self.finished)
+
+        if delay > 0 and (self.lost and self.can_send() or not self.finished and self.can_send_new()):
+            self.loop.call_at("pace", now + delay, self.retransmit_msgs)
+        else:
+            self.loop.cancel("pace")
+        deadline = self.timers.next_deadline()
+        if deadline is None:
+            self.loop.cancel("rto")
+        else:
+            self.loop.call_at("rto", deadline, self.expire_timers)
+        probe = self.probe_deadline()
+        if probe is None:
+            self.loop.cancel("probe")
+        else:
+            self.loop.call_at("probe", probe, self.send_probe)
 
-        if time_elapsed < 1.75 * self.rtt:
-            if self.window < self.target_window:
-                self.window += 1
-        elif time_elapsed > 1.75 * self.rtt and 2 * self.window > self.target_window and len(self.msgs_waiting_ack) + 3> self.window:
-            self.window = 1
-            if self.target_window > 2:
-                self.target_window = self.target_window - 1
+    def start(self):
+        """ Sets us up on our event loop, which the caller then runs. """
+        self.loop.add_reader(self.socket, self.receive_acks)
+        self.loop.at_end_of_pass(self.schedule)
+        self.schedule()
 
     def run(self):
         """
         The main function that runs our program.
         """
-        while True:
-            sockets = [self.socket, sys.stdin] if not self.waiting and not self.finished else [self.socket]
-
-            socks = select.select(sockets, [], [], 0.1)[0]
-            for conn in socks:
-                if conn == self.socket:
-                    try: 
-                        k, addr = conn.recvfrom(65535)
-                        msg = json.loads(k.decode('utf-8'))
-
-                        self.log("Received message '%s'" % msg)
-
-                        if msg["id"] in self.msgs_waiting_ack and msg["type"] == "ack":
-                            # If we recieve an ACK, remove it from the msgs_waiting_ack list.
-                            self.msgs_waiting_ack.pop(msg["id"])              
-                        self.waiting = False
-
-                        # Update our time_out value
-                        self.update_time_out()
-                    except (ValueError, KeyError, TypeError) as e:
-                        # If we have an error parsing our message, that means we have a corrupted 
-                        # packet and we log it as such.
-                        self.log(str(e))
-                        self.log("corrupt msg")
-                        
-                elif conn == sys.stdin:
-                    data = sys.stdin.read(DATA_SIZE)
-                    if len(data) == 0:
-                        self.log("All done!")
-                        self.finished = True
-                        # If we have no more data to output, we set self.finished to True.
-                        continue
-
-                    # Increment our current message ID and craft our msg packet.
-                    self.id_generator += 1
-                    msg = { "id": self.id_generator, "type": "msg", "data": data, "cs" : self.checksum256(data)}
-
-                    # Add this message to msg_waiting_acct
-                    self.msgs_waiting_ack[self.id_generator]= msg
-
-                    self.send_msg(msg)
-
-            if self.finished and len(self.msgs_waiting_ack) == 0:
-                return
-            self.congestion_control()
-            # Decide whether or not to retransmit messages based on the given time.            
-            self.retransmit_msgs()
-
-        return
+        self.start()
+        self.loop.run()
 
 if __name__ == "__main__":
     """
@@ -179,6 +539,17 @@ if __name__ == "__main__":
     parser = argparse.ArgumentParser(description='send data')
     parser.add_argument('host', type=str, help="Remote host to connect to")
     parser.add_argument('port', type=int, help="UDP port number to connect to")
+    parser.add_argument('--format', choices=sorted(protocol.FORMATS), default="binary",
+                        help="Wire format to encode packets with")
+    parser.add_argument('--checksum', choices=sorted(integrity.ALGORITHMS), default=integrity.DEFAULT,
+                        help="Checksum algorithm to protect packets with")
+    parser.add_argument('--dupthresh', type=int, default=3,
+                        help="Acknowledged messages past a hole that trigger a fast retransmit")
+    parser.add_argument('--cc', choices=sorted(congestion.CONTROLLERS), default=congestion.DEFAULT,
+                        help="Congestion control algorithm")
+    parser.add_argument('--linger', type=float, default=3.0,
+                        help="Seconds to keep resending the FIN once all data has been acknowledged")
     args = parser.parse_args()
-    sender = Sender(args.host, args.port)
+    sender = Sender(args.host, args.port, args.format, args.checksum, args.dupthresh, args.cc,
+                    args.linger)
     sender.run()
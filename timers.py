@@ -0,0 +1,55 @@
+#!/usr/bin/env python3
+
+import heapq
+
+class TimerQueue:
+    """
+    A set of timers, at most one per key, ordered by deadline in a heap. Cancelling or
+    rescheduling a timer leaves its old heap entry behind; stale entries are skipped when they
+    reach the top, so expiring timers costs O(log n) per timer that fired rather than a scan of
+    every timer.
+    Attributes
+    ----------
+    heap : list
+        (deadline, key) pairs, some of which may be stale.
+    deadlines : dict
+        The live deadline of each key with a pending timer.
+    """
+    def __init__(self):
+        self.heap = []
+        self.deadlines = {}
+
+    def __len__(self):
+        return len(self.deadlines)
+
+    def __contains__(self, key):
+        return key in self.deadlines
+
+    def schedule(self, key, deadline):
+        """ Sets the timer for the given key to fire at the given deadline, replacing any other. """
+        self.deadlines[key] = deadline
+        heapq.heappush(self.heap, (deadline, key))
+        # Keep the stale entries from outgrowing the live ones
+        if len(self.heap) > 2 * len(self.deadlines) + 64:
+            self.heap = [(deadline, key) for key, deadline in self.deadlines.items()]
+            heapq.heapify(self.heap)
+
+    def cancel(self, key):
+        """ Stops the timer for the given key, if there is one. """
+        self.deadlines.pop(key, None)
+
+    def next_deadline(self):
+        """ Returns the earliest pending deadline, or None if no timer is pending. """
+        while self.heap and self.deadlines.get(self.heap[0][1]) != self.heap[0][0]:
+            heapq.heappop(self.heap)
+        return self.heap[0][0] if self.heap else None
+
+    def expire(self, now):
+        """ Removes and returns the keys of every timer whose deadline is at or before now. """
+        expired = []
+        while self.heap and self.heap[0][0] <= now:
+            deadline, key = heapq.heappop(self.heap)
+            if self.deadlines.get(key) == deadline:
+                del self.deadlines[key]
+                expired.append(key)
+        return expired